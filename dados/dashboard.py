@@ -25,14 +25,16 @@ recalculando as análises e atualizando todos os componentes visuais.
 # --- IMPORTAÇÃO DAS BIBLIOTECAS ---
 # =================================================================================
 import dash
-from dash import dcc, html, dash_table # Componentes principais do Dash para layout e interatividade.
-from dash.dependencies import Input, Output # Para criar os callbacks que dão vida ao dashboard.
-import plotly.graph_objs as go # Usado para criar as figuras (gráficos) que serão exibidas.
+from dash import dcc, html, dash_table, Patch # Componentes principais do Dash para layout e interatividade.
+from dash.dependencies import Input, Output, State # Para criar os callbacks que dão vida ao dashboard.
+from plotly.subplots import make_subplots # Para agrupar os três gráficos em uma única figura.
+import plotly.graph_objs as go # Usado para criar as figuras (gráficos) que serão exibidas (com o pacote `orjson` instalado, o Plotly o usa automaticamente para serializá-las).
 import pandas as pd # Biblioteca fundamental para manipulação e análise de dados (usa DataFrames).
-from sqlalchemy import create_engine # Para criar uma conexão eficiente com o banco de dados, otimizada para o Pandas.
+from sqlalchemy import create_engine, event # Pool de conexões com o banco (usado via `raw_connection`) e evento que prepara as consultas em cada conexão nova.
 from sklearn.ensemble import IsolationForest # Modelo de ML para detecção de anomalias/outliers.
-from sklearn.linear_model import LinearRegression # Modelo de ML para previsão de tendência linear.
-import numpy as np # Biblioteca para cálculos numéricos, usada para preparar os dados para a previsão.
+import numpy as np # Biblioteca para cálculos numéricos, usada nas estatísticas e na regressão linear da previsão.
+import threading # Para proteger o cache de resultados, já que o Flask atende callbacks em várias threads.
+from collections import deque # Fila de tamanho fixo que guarda a janela das leituras mais recentes.
 
 # =================================================================================
 # --- CONFIGURAÇÕES ---
@@ -44,6 +46,21 @@ DB_NAME = "dados_sensores"
 DB_USER = "postgres"
 DB_PASS = "adminpostgres"
 
+# Quantidade de leituras mais recentes exibidas nos gráficos e usadas nas análises.
+JANELA_LEITURAS = 200
+# Máximo de pontos desenhados por série. Acima disso (se `JANELA_LEITURAS` for aumentada),
+# as séries são reduzidas com o algoritmo LTTB antes de serem enviadas ao navegador.
+PONTOS_MAXIMOS_GRAFICO = 500
+# Método usado para detectar anomalias:
+#   "isolation_forest": modelo de Machine Learning (padrão), capaz de notar combinações atípicas entre sensores.
+#   "zscore": teste estatístico simples, bem mais leve: marca a leitura se algum sensor se afastar
+#             mais de `LIMIAR_ZSCORE` desvios padrão da média da janela.
+METODO_ANOMALIAS = "isolation_forest"
+LIMIAR_ZSCORE = 3.0
+# O Isolation Forest só é treinado novamente após esta quantidade de leituras novas.
+# Entre um treino e outro, o modelo já ajustado é apenas reutilizado para classificar a janela.
+RETREINO_A_CADA = 50
+
 # =================================================================================
 # --- FUNÇÕES AUXILIARES ---
 # =================================================================================
@@ -53,64 +70,232 @@ def criar_engine_banco():
     Cria e retorna um engine de conexão do SQLAlchemy para o banco PostgreSQL.
 
     Um 'engine' gerencia um pool de conexões, o que é mais eficiente do que
-    abrir e fechar conexões para cada consulta.
+    abrir e fechar conexões para cada consulta. Por isso ele é criado uma única
+    vez (veja `ENGINE` abaixo) e reutilizado por todos os callbacks.
 
     @return: Um objeto `sqlalchemy.engine.Engine` em caso de sucesso, ou `None` em caso de erro.
     """
     try:
         # Formata a string de conexão (URI) no padrão esperado pelo SQLAlchemy.
         db_uri = f"postgresql+psycopg2://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-        engine = create_engine(db_uri)
+        # `pool_size`/`max_overflow`: limita o pool a poucas conexões persistentes.
+        # `pool_pre_ping`: testa a conexão antes de usá-la (recupera-se de reinícios do banco).
+        # `pool_recycle`: renova conexões antigas (em segundos) para evitar timeouts do servidor.
+        engine = create_engine(db_uri, pool_size=2, max_overflow=0, pool_pre_ping=True, pool_recycle=1800)
+        # Toda conexão nova aberta pelo pool já recebe as consultas preparadas do dashboard.
+        event.listen(engine, "connect", preparar_consultas)
         return engine
     except Exception as e:
         print(f"❌ Erro ao criar o engine do banco de dados: {e}")
         return None
 
+def preparar_consultas(dbapi_conn, connection_record):
+    """
+    Prepara no servidor a consulta incremental usada a cada atualização (`PREPARE`).
+
+    Chamada pelo SQLAlchemy sempre que o pool abre uma conexão nova. Com a consulta
+    preparada, o PostgreSQL não precisa analisar e planejar o mesmo SQL a cada 5 segundos;
+    basta executá-la (`EXECUTE`) com o último `id` conhecido.
+
+    @param dbapi_conn: A conexão psycopg2 recém-aberta.
+    @param connection_record: Registro interno do pool (não usado aqui).
+    """
+    with dbapi_conn.cursor() as cursor:
+        cursor.execute(
+            "PREPARE buscar_leituras_novas (bigint) AS "
+            "SELECT id, data_hora, temperatura, umidade, luminosidade FROM leituras_sensores WHERE id > $1 ORDER BY id;"
+        )
+    dbapi_conn.commit()
+
 def buscar_dados(engine):
     """
-    Busca os últimos 200 registros de leituras do banco de dados.
+    Busca no banco apenas as leituras que ainda não estão na janela em memória (`_BUFFER`).
+
+    Na primeira chamada (janela vazia) carrega os últimos `JANELA_LEITURAS` registros.
+    Nas seguintes, consulta somente as linhas com `id` maior que o último já recebido,
+    o que normalmente retorna zero ou poucas linhas por atualização. Quando não há nada
+    novo, essa consulta (que percorre o índice da chave primária) já é a verificação mais
+    barata possível: uma única ida ao banco, sem um `SELECT max(id)` prévio.
 
     @param engine: O engine de conexão do SQLAlchemy.
-    @return: Um DataFrame do Pandas com os dados, ou um DataFrame vazio em caso de erro.
+    @return: O `id` da leitura mais recente presente na janela (0 se ela estiver vazia).
     """
+    global _ULTIMO_ID
     if engine is None:
-        return pd.DataFrame() # Retorna um DataFrame vazio se não houver engine.
+        return _ULTIMO_ID
     try:
-        # Query SQL para selecionar as colunas desejadas, ordenando pela data mais recente
-        # e limitando o resultado aos últimos 200 registros.
-        query = "SELECT id, data_hora, temperatura, umidade, luminosidade FROM leituras_sensores ORDER BY data_hora DESC LIMIT 200;"
-        df = pd.read_sql_query(query, engine)
-        # Os dados vêm do banco em ordem decrescente (do mais novo para o mais antigo).
-        # Invertemos o DataFrame (`.iloc[::-1]`) para que a ordem no gráfico seja cronológica
-        # (do mais antigo para o mais novo), o que é mais intuitivo para visualização.
-        return df.iloc[::-1].reset_index(drop=True)
+        if not _BUFFER:
+            # Carga inicial: a subconsulta seleciona as leituras mais recentes e a consulta externa
+            # já as devolve em ordem cronológica (do mais antigo para o mais novo), como nos gráficos.
+            query = ("SELECT id, data_hora, temperatura, umidade, luminosidade FROM "
+                     "(SELECT * FROM leituras_sensores ORDER BY data_hora DESC, id DESC LIMIT %s) AS recentes "
+                     "ORDER BY data_hora ASC, id ASC;")
+            params = (JANELA_LEITURAS,)
+        else:
+            # Carga incremental: apenas o que chegou depois da última leitura conhecida
+            # (consulta preparada em `preparar_consultas`).
+            query = "EXECUTE buscar_leituras_novas (%s);"
+            params = (_ULTIMO_ID,)
+        # `raw_connection()` empresta uma conexão já aberta do pool (sem novo handshake) e dá
+        # acesso direto ao cursor do psycopg2, que devolve cada linha como uma tupla simples.
+        conn = engine.raw_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                linhas = cursor.fetchall()
+        finally:
+            conn.close() # Devolve a conexão ao pool (não a fecha de fato).
+        if linhas:
+            # A `deque` com `maxlen` descarta automaticamente as leituras mais antigas.
+            _BUFFER.extend(linhas)
+            _ULTIMO_ID = max(_ULTIMO_ID, max(linha[0] for linha in linhas))
     except Exception as error:
         print(f"🔥 Erro ao buscar dados: {error}")
-        return pd.DataFrame()
+    return _ULTIMO_ID
+
+def dataframe_da_janela():
+    """
+    Converte a janela de leituras em memória em um DataFrame do Pandas.
+
+    As colunas dos sensores são convertidas para `float32`: a precisão dos sensores não
+    justifica `float64`, e com metade dos bytes todas as etapas seguintes (modelo,
+    estatísticas e serialização dos gráficos) movimentam menos memória.
+
+    @return: Um DataFrame com as leituras em ordem cronológica, ou um DataFrame vazio.
+    """
+    n = len(_BUFFER)
+    # Separa as tuplas (id, data_hora, temperatura, umidade, luminosidade) em colunas
+    # e preenche cada coluna numérica direto em um array NumPy já com o tipo final.
+    ids, datas, temperaturas, umidades, luminosidades = zip(*_BUFFER) if n else ((),) * 5
+    return pd.DataFrame({
+        'id': np.fromiter(ids, dtype=np.int64, count=n),
+        'data_hora': pd.to_datetime(list(datas)),
+        'temperatura': np.fromiter(temperaturas, dtype=np.float32, count=n),
+        'umidade': np.fromiter(umidades, dtype=np.float32, count=n),
+        'luminosidade': np.fromiter(luminosidades, dtype=np.float32, count=n),
+    })
+
+def sinalizar_por_zscore(X, limiar=LIMIAR_ZSCORE):
+    """
+    Marca como anomalia as linhas em que algum sensor está a mais de `limiar` desvios padrão da média.
+
+    Todo o cálculo é vetorizado no NumPy (uma passada por operação sobre a matriz),
+    então não há laço em Python nem modelo a ser treinado.
+
+    @param X: Matriz NumPy (linhas x sensores) com as leituras.
+    @param limiar: Quantos desvios padrão caracterizam uma leitura atípica.
+    @return: Um array `int8` com -1 para anomalias e 1 para pontos normais.
+    """
+    media = X.mean(axis=0)
+    desvio = X.std(axis=0)
+    desvio[desvio == 0] = 1 # Sensor constante na janela: evita divisão por zero (z fica 0).
+    z = np.abs((X - media) / desvio)
+    return np.where((z > limiar).any(axis=1), np.int8(-1), np.int8(1))
+
+def treinar_modelo_anomalias(X, ultimo_id):
+    """
+    Treina um novo Isolation Forest e o publica como o modelo atual do dashboard.
+
+    O modelo novo só substitui o anterior quando o treino termina (uma troca de
+    referência), então quem estiver usando o modelo antigo não é afetado.
+
+    @param X: Matriz NumPy (linhas x sensores) usada no treino.
+    @param ultimo_id: O `id` da leitura mais recente presente em `X`.
+    """
+    global _MODELO_ANOMALIAS, _MODELO_TREINADO_EM
+    # 'n_estimators'=50: para ~200 amostras, árvores além disso quase não mudam o resultado.
+    # 'contamination'='auto' permite que o modelo decida o limiar de anomalia.
+    # 'random_state' garante que o resultado seja o mesmo a cada execução (reprodutibilidade).
+    modelo = IsolationForest(n_estimators=50, contamination='auto', random_state=42)
+    modelo.fit(X)
+    _MODELO_ANOMALIAS = modelo
+    _MODELO_TREINADO_EM = ultimo_id
+
+def retreinar_em_segundo_plano(X, ultimo_id):
+    """
+    Executa `treinar_modelo_anomalias` em uma thread separada e libera `_TREINO_LOCK` ao final.
+
+    @param X: Matriz NumPy (linhas x sensores) usada no treino.
+    @param ultimo_id: O `id` da leitura mais recente presente em `X`.
+    """
+    try:
+        treinar_modelo_anomalias(X, ultimo_id)
+    except Exception as error:
+        print(f"🔥 Erro ao treinar o modelo de anomalias: {error}")
+    finally:
+        _TREINO_LOCK.release()
 
 def detectar_anomalias(df):
     """
     Utiliza o modelo Isolation Forest para detectar anomalias no DataFrame.
 
     O Isolation Forest "isola" observações aleatoriamente. Anomalias são mais
-    fáceis de isolar e, portanto, são identificadas como tal.
+    fáceis de isolar e, portanto, são identificadas como tal. Se `METODO_ANOMALIAS`
+    for "zscore", usa o teste estatístico de `sinalizar_por_zscore` no lugar do modelo.
+
+    Treinar o modelo é a etapa mais cara do dashboard, e a janela muda muito pouco
+    entre duas atualizações. Por isso o modelo treinado é guardado e só é ajustado
+    novamente quando chegam `RETREINO_A_CADA` leituras novas. Esse novo treino roda em
+    uma thread separada: enquanto ele não termina, o callback segue classificando com
+    o modelo anterior, sem bloquear a resposta ao navegador. Apenas o primeiro treino
+    (quando ainda não existe modelo) é feito na hora.
 
     @param df: DataFrame do Pandas contendo os dados dos sensores.
-    @return: O mesmo DataFrame com uma nova coluna 'anomalia' (-1 para anomalia, 1 para normal).
+    @return: Um array NumPy `int8` com um rótulo por linha de `df` (-1 para anomalia, 1 para normal).
+             Como os rótulos só assumem dois valores, 1 byte por linha é suficiente.
     """
     # O modelo precisa de pelo menos 2 pontos para funcionar.
     if df.shape[0] < 2:
-        df['anomalia'] = 1 # Marca como normal se não houver dados suficientes.
-        return df
-        
+        return np.ones(df.shape[0], dtype=np.int8) # Marca como normal se não houver dados suficientes.
+
     features = ['temperatura', 'umidade', 'luminosidade']
-    # 'contamination'='auto' permite que o modelo decida o limiar de anomalia.
-    # 'random_state' garante que o resultado seja o mesmo a cada execução (reprodutibilidade).
-    model = IsolationForest(contamination='auto', random_state=42)
-    model.fit(df[features])
-    # `predict` retorna -1 para anomalias e 1 para pontos normais.
-    df['anomalia'] = model.predict(df[features])
-    return df
+    # Matriz em `float32`: o scikit-learn trabalha internamente nesse tipo e não precisa convertê-la.
+    X = df[features].to_numpy(dtype=np.float32)
+    if METODO_ANOMALIAS == "zscore":
+        return sinalizar_por_zscore(X)
+
+    ultimo_id = int(df['id'].iloc[-1])
+    if _MODELO_ANOMALIAS is None:
+        treinar_modelo_anomalias(X, ultimo_id)
+    elif ultimo_id - _MODELO_TREINADO_EM >= RETREINO_A_CADA and _TREINO_LOCK.acquire(blocking=False):
+        # O lock garante um único treino em andamento; ele é liberado pela própria thread.
+        threading.Thread(target=retreinar_em_segundo_plano, args=(X, ultimo_id), daemon=True).start()
+    # `predict` retorna -1 para anomalias e 1 para pontos normais (em `int64`, convertido para `int8`).
+    return _MODELO_ANOMALIAS.predict(X).astype(np.int8)
+
+def reduzir_pontos_lttb(x, y, n_saida):
+    """
+    Escolhe `n_saida` pontos de uma série preservando sua forma visual (algoritmo LTTB).
+
+    O LTTB ("Largest-Triangle-Three-Buckets") mantém o primeiro e o último ponto e divide os
+    demais em `n_saida - 2` grupos. De cada grupo escolhe o ponto que forma o maior triângulo
+    com o ponto escolhido no grupo anterior e com a média do grupo seguinte, o que preserva
+    picos e vales (inclusive leituras atípicas) mesmo com bem menos pontos.
+
+    @param x: Array NumPy numérico com as posições dos pontos no eixo X (ex: horários em ns).
+    @param y: Array NumPy com os valores da série.
+    @param n_saida: Quantidade de pontos desejada.
+    @return: Um array com os índices dos pontos escolhidos, em ordem crescente.
+    """
+    n = len(y)
+    if n_saida >= n or n_saida < 3:
+        return np.arange(n)
+    indices = np.empty(n_saida, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    # Limites dos grupos intermediários (o último ponto forma sozinho o grupo final).
+    limites = np.linspace(1, n - 1, n_saida - 1).astype(np.int64)
+    anterior = 0
+    for i in range(n_saida - 2):
+        inicio, fim = limites[i], limites[i + 1]
+        proximo_fim = limites[i + 2] if i + 2 < len(limites) else n
+        media_x = x[fim:proximo_fim].mean()
+        media_y = y[fim:proximo_fim].mean()
+        # Área (em dobro) do triângulo formado com o ponto anterior e a média do próximo grupo.
+        areas = np.abs((x[anterior] - media_x) * (y[inicio:fim] - y[anterior])
+                       - (x[anterior] - x[inicio:fim]) * (media_y - y[anterior]))
+        anterior = inicio + int(np.argmax(areas))
+        indices[i + 1] = anterior
+    return indices
 
 def prever_proxima_temperatura(df):
     """
@@ -126,22 +311,71 @@ def prever_proxima_temperatura(df):
     if df.shape[0] < 10:
         return "Dados insuficientes para prever"
 
-    # Prepara os dados para o modelo:
-    # X: Variável independente (o tempo, representado pelo índice do DataFrame).
-    # y: Variável dependente (o que queremos prever, a temperatura).
-    X = np.array(df.index).reshape(-1, 1) # `reshape` é necessário para o formato esperado pelo scikit-learn.
-    y = df['temperatura'].values
-
-    # Cria e treina o modelo de Regressão Linear.
-    model = LinearRegression()
-    model.fit(X, y)
+    # Como X é o próprio índice (0, 1, ..., n-1), igualmente espaçado, a regressão linear
+    # por mínimos quadrados tem solução fechada, sem precisar montar/ajustar um modelo:
+    #   inclinação = Σ(x - x̄)(y - ȳ) / Σ(x - x̄)²,  com x̄ = (n-1)/2 e Σ(x - x̄)² = n(n²-1)/12
+    #   intercepto = ȳ - inclinação * x̄
+    n = len(df)
+    y = df['temperatura'].to_numpy(dtype=np.float32)
+    x_media = (n - 1) / 2
+    y_media = y.mean()
+    inclinacao = ((np.arange(n) - x_media) * (y - y_media)).sum() / (n * (n * n - 1) / 12)
+    intercepto = y_media - inclinacao * x_media
 
     # Prevê o valor para o próximo índice (que representa o próximo ponto no tempo).
-    proximo_index = len(df)
-    previsao = model.predict(np.array([[proximo_index]]))
+    previsao = intercepto + inclinacao * n
 
     # Retorna a previsão formatada com duas casas decimais.
-    return f"{previsao[0]:.2f} °C"
+    return f"{previsao:.2f} °C"
+
+def criar_modelo_grafico():
+    """
+    Monta, com o Plotly, as partes fixas do gráfico de sensores (layout e aparência das séries).
+
+    A figura tem um subgráfico por sensor (`_SENSORES`), cada um com uma série de leituras
+    seguida de uma série de anomalias, ainda sem dados. Ela é criada e validada uma única vez;
+    o resultado é convertido em dicionários simples que `montar_componentes` apenas completa
+    com `x`/`y` a cada atualização, sem repetir a validação (a parte mais cara do Plotly).
+
+    @return: Uma tupla (layout, lista de séries), ambos como dicionários no formato do Plotly.
+    """
+    fig = make_subplots(rows=3, cols=1, shared_xaxes=True, vertical_spacing=0.06,
+                        subplot_titles=[titulo for _, titulo, _ in _SENSORES])
+    for linha, (_, titulo, cor) in enumerate(_SENSORES, start=1):
+        # `Scattergl` desenha com WebGL (placa de vídeo), mantendo a renderização leve mesmo com muitos pontos.
+        fig.add_trace(go.Scattergl(mode='lines+markers', name=titulo, marker_color=cor), row=linha, col=1)
+        # Anomalias como marcadores 'X' vermelhos. Na legenda, as três séries de anomalias
+        # aparecem como um único item.
+        fig.add_trace(go.Scattergl(mode='markers', name='Anomalia', legendgroup='anomalia', showlegend=(linha == 1),
+                                   marker_symbol='x', marker_size=10, marker_color='red'), row=linha, col=1)
+    fig.update_layout(margin=dict(l=40, r=40, t=40, b=40))
+    return fig.layout.to_plotly_json(), [serie.to_plotly_json() for serie in fig.data]
+
+# =================================================================================
+# --- ESTADO COMPARTILHADO ENTRE OS CALLBACKS ---
+# =================================================================================
+
+# Engine único do módulo: criado na importação e compartilhado por todos os callbacks,
+# evitando o custo de conexão (TCP + autenticação) a cada atualização do dashboard.
+ENGINE = criar_engine_banco()
+
+# Janela deslizante com as últimas leituras já trazidas do banco e o maior `id` recebido.
+# Assim, a cada atualização só as linhas novas trafegam pela rede.
+_BUFFER = deque(maxlen=JANELA_LEITURAS)
+_ULTIMO_ID = 0
+
+# Modelo Isolation Forest já treinado e o `id` da última leitura usada no treino.
+_MODELO_ANOMALIAS = None
+_MODELO_TREINADO_EM = -1
+# Fica travado enquanto um novo treino roda em segundo plano.
+_TREINO_LOCK = threading.Lock()
+
+# Cache do último conjunto de componentes gerado, indexado pelo `id` da leitura mais recente.
+# Se nenhuma leitura nova chegou, o callback devolve esse resultado sem refazer o processamento.
+# `ids` guarda os ids da janela usada, para calcular o que falta em cada navegador, e
+# `versao_anomalias` só muda quando o conjunto de leituras marcadas como anomalia muda.
+_CACHE = {"chave": None, "componentes": None, "ids": [], "ids_anomalias": [], "versao_anomalias": 0}
+_CACHE_LOCK = threading.Lock()
 
 # =================================================================================
 # --- INICIALIZAÇÃO E LAYOUT DO APP DASH ---
@@ -153,16 +387,22 @@ external_stylesheets = ['https://codepen.io/chriddyp/pen/bWLwgP.css']
 app = dash.Dash(__name__, external_stylesheets=external_stylesheets)
 app.title = "Dashboard Avançado de Sensores"
 
+# Texto explicativo do método de detecção de anomalias escolhido em `METODO_ANOMALIAS`.
+_DESCRICAO_ANOMALIAS = {
+    "isolation_forest": '**Detecção de Anomalias (Isolation Forest):** O modelo aprende o comportamento "normal" dos seus sensores, incluindo combinações de leituras (ex: temperatura alta com umidade muito baixa).',
+    "zscore": '**Detecção de Anomalias (Z-score):** Cada sensor é comparado com a média e o desvio padrão das leituras recentes.',
+}
+
 # `app.layout` define a estrutura visual da página, como uma árvore de componentes HTML e Dash.
 app.layout = html.Div(children=[
     html.H1(children='Dashboard Avançado com Machine Learning', style={'textAlign': 'center', 'marginBottom': '20px'}),
 
     # Bloco explicativo sobre o uso de Machine Learning no dashboard.
     html.Div([
-        dcc.Markdown("""
+        dcc.Markdown(f"""
             **Como o Machine Learning é usado aqui?**
             Este dashboard utiliza dois modelos de Machine Learning em tempo real:
-            1.  **Detecção de Anomalias (Isolation Forest):** O modelo aprende o comportamento "normal" dos seus sensores. Se uma combinação de leituras (ex: temperatura alta com umidade muito baixa) foge desse padrão, ela é marcada como uma **anomalia (X vermelho)** nos gráficos e listada na tabela.
+            1.  {_DESCRICAO_ANOMALIAS[METODO_ANOMALIAS]} Se uma leitura foge desse padrão, ela é marcada como uma **anomalia (X vermelho)** nos gráficos e listada na tabela.
             2.  **Previsão de Tendência (Regressão Linear):** O modelo analisa a tendência recente da temperatura para **prever qual será o próximo valor** registrado, auxiliando na antecipação de mudanças.
         """, style={'backgroundColor': '#f9f9f9', 'border': '1px solid #ddd', 'padding': '10px', 'borderRadius': '5px'})
     ], style={'width': '80%', 'margin': 'auto', 'marginBottom': '20px'}),
@@ -202,10 +442,18 @@ app.layout = html.Div(children=[
         )
     ], style={'width': '80%', 'margin': 'auto'}),
 
-    # Componentes de gráfico que serão preenchidos pelo callback.
-    dcc.Graph(id='grafico-temperatura'),
-    dcc.Graph(id='grafico-umidade'),
-    dcc.Graph(id='grafico-luminosidade'),
+    # Gráfico único (com um subgráfico por sensor) que será preenchido pelo callback.
+    # Uma figura só significa um único JSON e uma única renderização por atualização.
+    dcc.Graph(id='grafico-sensores', style={'height': '900px'}),
+
+    # Guarda, no navegador, o `id` da última leitura já desenhada e quantos pontos os gráficos têm.
+    # Com isso o servidor envia apenas os pontos novos, em vez das figuras inteiras.
+    dcc.Store(id='estado-graficos'),
+
+    # Versões dos dados já recebidos por este navegador. Cada grupo de componentes depende só da
+    # versão que o afeta e é atualizado apenas quando ela muda.
+    dcc.Store(id='versao-dados'),
+    dcc.Store(id='versao-anomalias'),
 
     # Componente invisível que funciona como um "timer".
     # A cada `interval` (5000 ms), ele atualiza sua propriedade `n_intervals`,
@@ -213,6 +461,36 @@ app.layout = html.Div(children=[
     dcc.Interval(id='intervalo-atualizacao', interval=5*1000, n_intervals=0)
 ])
 
+# =================================================================================
+# --- COMPONENTES ESTÁTICOS ---
+# =================================================================================
+# Partes que nunca mudam entre as atualizações são criadas uma única vez e reutilizadas.
+
+# Cabeçalho da tabela de estatísticas.
+_CABECALHO_ESTATISTICAS = html.Thead(html.Tr([html.Th("Estatística"), html.Th("Temperatura"), html.Th("Umidade"), html.Th("Luminosidade")]))
+
+# Nomes das linhas da tabela de estatísticas.
+_NOMES_ESTATISTICAS = ['Última Leitura', 'Média', 'Mediana', 'Mínimo', 'Máximo', 'Desvio Padrão', 'Variância']
+
+# Campos de cada linha da tabela de anomalias: as colunas exibidas e o `id` da leitura, que não
+# aparece na tabela mas identifica as linhas (usado para detectar mudanças nas anomalias).
+_CAMPOS_ANOMALIAS = ['id', 'data_hora', 'temperatura', 'umidade', 'luminosidade']
+
+# Sensores exibidos no gráfico: (coluna, título do subgráfico, cor da série de leituras).
+_SENSORES = [
+    ('temperatura', 'Temperatura (°C)', 'blue'),
+    ('umidade', 'Umidade Relativa (%)', 'orange'),
+    ('luminosidade', 'Luminosidade (Lux)', 'green'),
+]
+
+# Partes fixas do gráfico de sensores, montadas uma única vez (veja `criar_modelo_grafico`).
+_LAYOUT_GRAFICO, _SERIES_GRAFICO = criar_modelo_grafico()
+
+# Componentes exibidos enquanto não há leituras no banco.
+_FIGURA_VAZIA = go.Figure().update_layout(title='Aguardando dados...')
+_TABELA_VAZIA = [html.Thead(html.Tr(html.Th("Aguardando dados...")))]
+_CARD_VAZIO = html.P("Aguardando dados...")
+
 # =================================================================================
 # --- CALLBACKS (LÓGICA INTERATIVA) ---
 # =================================================================================
@@ -220,75 +498,257 @@ app.layout = html.Div(children=[
 # O decorador `@app.callback` conecta as saídas (Output) com as entradas (Input).
 # Sempre que a propriedade do Input mudar, a função abaixo será executada,
 # e seu retorno atualizará as propriedades dos Outputs.
+#
+# A cada intervalo, `verificar_novas_leituras` atualiza apenas as versões guardadas no
+# navegador. Os demais callbacks dependem dessas versões e só rodam (e só enviam dados)
+# quando a versão que os afeta muda:
+#   'versao-dados'     -> gráfico, tabela de estatísticas e card de previsão;
+#   'versao-anomalias' -> tabela de anomalias.
 @app.callback(
-    [Output('grafico-temperatura', 'figure'),
-     Output('grafico-umidade', 'figure'),
-     Output('grafico-luminosidade', 'figure'),
-     Output('tabela-estatisticas', 'children'),
-     Output('tabela-anomalias', 'data'),
-     Output('card-previsao', 'children')],
-    [Input('intervalo-atualizacao', 'n_intervals')]
+    [Output('versao-dados', 'data'),
+     Output('versao-anomalias', 'data')],
+    [Input('intervalo-atualizacao', 'n_intervals')],
+    [State('versao-dados', 'data'),
+     State('versao-anomalias', 'data')]
 )
-def atualizar_componentes(n):
+def verificar_novas_leituras(n, versao_dados, versao_anomalias):
     """
-    Função executada a cada intervalo de tempo para atualizar todos os componentes do dashboard.
+    Função executada a cada intervalo de tempo para buscar leituras novas no banco.
+
+    Se nenhuma leitura chegou e o navegador já tem as versões mais recentes, nada é enviado
+    e nenhum outro callback é disparado.
 
     @param n: O número de vezes que o intervalo foi acionado (não usado diretamente, mas necessário para o Input).
-    @return: Uma tupla com os novos valores para cada Output na ordem em que foram declarados.
+    @param versao_dados: O `id` da leitura mais recente que este navegador já recebeu.
+    @param versao_anomalias: A versão do conjunto de anomalias que este navegador já recebeu.
+    @return: As novas versões, ou `dash.no_update` para as que não mudaram.
+    """
+    atualizar_cache()
+    cache = ler_cache()
+    return (
+        cache["chave"] if cache["chave"] != versao_dados else dash.no_update,
+        cache["versao_anomalias"] if cache["versao_anomalias"] != versao_anomalias else dash.no_update,
+    )
+
+@app.callback(
+    [Output('grafico-sensores', 'figure'),
+     Output('estado-graficos', 'data')],
+    [Input('versao-dados', 'data')],
+    [State('estado-graficos', 'data')],
+    prevent_initial_call=True
+)
+def atualizar_grafico(versao_dados, estado):
+    """
+    Atualiza o gráfico dos sensores quando chegam leituras novas.
+
+    Se o navegador está só alguns pontos atrás, recebe apenas esses pontos
+    (veja `montar_patch_grafico`); caso contrário, recebe a figura completa.
+
+    @param versao_dados: O `id` da leitura mais recente (apenas dispara o callback).
+    @param estado: O conteúdo do `dcc.Store` 'estado-graficos' deste navegador (ou `None` na primeira vez).
+    @return: A figura (completa ou parcial) e o novo estado do gráfico.
+    """
+    cache = ler_cache()
+    ultimo_id, ids = cache["chave"], cache["ids"]
+    # Este navegador já exibe a versão mais recente: nada precisa ser enviado.
+    if estado is not None and estado['id'] == ultimo_id:
+        return dash.no_update, dash.no_update
+
+    figura = cache["componentes"][0]
+    atualizacao_parcial = calcular_atualizacao_parcial(estado, ids)
+    if atualizacao_parcial is not None:
+        figura = montar_patch_grafico(figura, *atualizacao_parcial)
+    return figura, {'id': ultimo_id, 'n': len(ids)}
+
+@app.callback(
+    [Output('tabela-estatisticas', 'children'),
+     Output('card-previsao', 'children')],
+    [Input('versao-dados', 'data')],
+    prevent_initial_call=True
+)
+def atualizar_estatisticas(versao_dados):
+    """
+    Atualiza a tabela de estatísticas e o card de previsão quando chegam leituras novas.
+
+    @param versao_dados: O `id` da leitura mais recente (apenas dispara o callback).
+    @return: O conteúdo da tabela de estatísticas e do card de previsão.
+    """
+    _, tabela_stats_children, _, card_previsao_children = ler_cache()["componentes"]
+    return tabela_stats_children, card_previsao_children
+
+@app.callback(
+    Output('tabela-anomalias', 'data'),
+    [Input('versao-anomalias', 'data')],
+    prevent_initial_call=True
+)
+def atualizar_anomalias(versao_anomalias):
+    """
+    Atualiza a tabela de anomalias, apenas quando o conjunto de anomalias muda.
+
+    @param versao_anomalias: A versão do conjunto de anomalias (apenas dispara o callback).
+    @return: As linhas da tabela de anomalias.
+    """
+    return ler_cache()["componentes"][2]
+
+def atualizar_cache():
+    """
+    Busca as leituras novas e, se houver alguma, remonta os componentes guardados em `_CACHE`.
     """
-    # 1. Busca os dados mais recentes do banco.
-    engine = criar_engine_banco()
-    df_raw = buscar_dados(engine)
+    # O lock evita que duas threads (ex: duas abas abertas) alterem a janela ou
+    # recalculem tudo ao mesmo tempo.
+    with _CACHE_LOCK:
+        ultimo_id = buscar_dados(ENGINE)
+        if _CACHE["componentes"] is None or _CACHE["chave"] != ultimo_id:
+            df_raw = dataframe_da_janela()
+            componentes = montar_componentes(df_raw)
+            ids_anomalias = [linha['id'] for linha in componentes[2]]
+            if ids_anomalias != _CACHE["ids_anomalias"]:
+                _CACHE["ids_anomalias"] = ids_anomalias
+                _CACHE["versao_anomalias"] += 1
+            _CACHE["componentes"] = componentes
+            _CACHE["ids"] = df_raw['id'].tolist()
+            _CACHE["chave"] = ultimo_id
+
+def ler_cache():
+    """
+    Devolve uma cópia rasa de `_CACHE`, lida de forma consistente (sob o lock).
+
+    Os valores guardados nunca são alterados, apenas substituídos, então a cópia pode
+    ser usada fora do lock com segurança.
+
+    @return: Um dicionário com as mesmas chaves de `_CACHE`.
+    """
+    with _CACHE_LOCK:
+        return dict(_CACHE)
 
+def calcular_atualizacao_parcial(estado, ids):
+    """
+    Verifica se os gráficos de um navegador podem ser atualizados só com os pontos novos.
+
+    @param estado: O conteúdo do `dcc.Store` 'estado-graficos' do navegador.
+    @param ids: Os ids das leituras da janela atual, em ordem cronológica.
+    @return: Uma tupla (pontos novos, pontos a descartar do início), ou `None` se for
+             preciso enviar as figuras completas (primeira carga, navegador muito atrasado, etc.).
+    """
+    if not estado or estado['id'] not in ids:
+        return None
+    novos = len(ids) - 1 - ids.index(estado['id'])
+    # Quantos pontos antigos saíram da janela (a deque descarta os mais antigos).
+    descartar = estado['n'] + novos - len(ids)
+    # Se faltar mais da metade da janela, é mais barato enviar a figura inteira.
+    if descartar < 0 or novos > len(ids) // 2:
+        return None
+    # Séries reduzidas pelo LTTB não correspondem ponto a ponto à janela: envia a figura inteira.
+    if len(ids) > PONTOS_MAXIMOS_GRAFICO:
+        return None
+    return novos, descartar
+
+def montar_patch_grafico(fig, novos, descartar):
+    """
+    Monta uma atualização parcial (`dash.Patch`) do gráfico já exibido no navegador.
+
+    A figura tem, para cada sensor, uma série de leituras seguida de uma série de anomalias.
+    Cada série de leituras recebe apenas os últimos `novos` pontos e perde os `descartar`
+    mais antigos; as séries de anomalias (pequenas) são substituídas por inteiro, pois o
+    modelo pode reclassificar pontos antigos.
+
+    @param fig: A figura completa mais recente (gerada por `montar_componentes`).
+    @param novos: Quantidade de pontos novos a acrescentar.
+    @param descartar: Quantidade de pontos a remover do início da série.
+    @return: Um objeto `dash.Patch` com as operações a aplicar na figura do navegador.
+    """
+    patch = Patch()
+    for i in range(0, len(fig['data']), 2):
+        leituras, anomalias = fig['data'][i], fig['data'][i + 1]
+        for _ in range(descartar):
+            del patch['data'][i]['x'][0]
+            del patch['data'][i]['y'][0]
+        # Os horários vão como texto ISO: soltos da lista, os `np.datetime64` seriam serializados
+        # como inteiros (nanossegundos) quando o `orjson` não está instalado.
+        patch['data'][i]['x'].extend(np.datetime_as_string(leituras['x'][-novos:], unit='us').tolist())
+        patch['data'][i]['y'].extend(list(leituras['y'][-novos:]))
+        patch['data'][i + 1]['x'] = anomalias['x']
+        patch['data'][i + 1]['y'] = anomalias['y']
+    return patch
+
+def montar_componentes(df):
+    """
+    Aplica os modelos de Machine Learning e monta todos os componentes visuais do dashboard.
+
+    @param df: DataFrame com as leituras da janela (veja `dataframe_da_janela`). Recebe
+               a coluna 'anomalia' com os rótulos de `detectar_anomalias`.
+    @return: Uma tupla (figura, tabela de estatísticas, linhas da tabela de anomalias, card de previsão).
+    """
     # Se o DataFrame estiver vazio, retorna componentes vazios para evitar erros.
-    if df_raw.empty:
-        empty_fig = go.Figure().update_layout(title='Aguardando dados...')
-        empty_table = [html.Thead(html.Tr(html.Th("Aguardando dados...")))]
-        empty_card = html.P("Aguardando dados...")
-        return empty_fig, empty_fig, empty_fig, empty_table, [], empty_card
-
-    # 2. Aplica os modelos de Machine Learning.
-    df = detectar_anomalias(df_raw.copy()) # Usa uma cópia para evitar SettingWithCopyWarning
-    df_anomalias = df[df['anomalia'] == -1]
+    if df.empty:
+        return _FIGURA_VAZIA, _TABELA_VAZIA, [], _CARD_VAZIO
+
+    # 1. Aplica os modelos de Machine Learning. O DataFrame é montado do zero a cada chamada
+    #    por `dataframe_da_janela`, então a coluna de rótulos é adicionada nele mesmo, sem cópia.
+    df['anomalia'] = detectar_anomalias(df)
     previsao_temp = prever_proxima_temperatura(df)
 
-    # 3. Cria os gráficos, destacando as anomalias.
-    def criar_grafico_com_anomalias(df_plot, y_col, titulo, cor):
-        fig = go.Figure()
-        # Adiciona a série de dados normais (anomalia == 1).
-        fig.add_trace(go.Scatter(x=df_plot[df_plot['anomalia'] == 1]['data_hora'], y=df_plot[df_plot['anomalia'] == 1][y_col], mode='lines+markers', name='Normal', marker_color=cor))
-        # Se houver anomalias, adiciona-as como marcadores 'X' vermelhos.
-        if not df_anomalias.empty:
-            fig.add_trace(go.Scatter(x=df_anomalias['data_hora'], y=df_anomalias[y_col], mode='markers', name='Anomalia', marker_symbol='x', marker_size=10, marker_color='red'))
-        fig.update_layout(title=titulo, margin=dict(l=40, r=40, t=40, b=40))
-        return fig
-
-    fig_temp = criar_grafico_com_anomalias(df, 'temperatura', 'Temperatura (°C)', 'blue')
-    fig_umid = criar_grafico_com_anomalias(df, 'umidade', 'Umidade Relativa (%)', 'orange')
-    fig_lum = criar_grafico_com_anomalias(df, 'luminosidade', 'Luminosidade (Lux)', 'green')
-
-    # 4. Calcula as estatísticas descritivas usando o Pandas.
-    stats_df = df[['temperatura', 'umidade', 'luminosidade']]
-    stats = {
-        'Última Leitura': stats_df.iloc[-1], 'Média': stats_df.mean(),
-        'Mediana': stats_df.median(), 'Mínimo': stats_df.min(),
-        'Máximo': stats_df.max(), 'Desvio Padrão': stats_df.std(),
-        'Variância': stats_df.var(),
-    }
-    # Monta a tabela de estatísticas com componentes HTML.
-    header = [html.Thead(html.Tr([html.Th("Estatística"), html.Th("Temperatura"), html.Th("Umidade"), html.Th("Luminosidade")]))]
-    body = [html.Tbody([
-        html.Tr([
-            html.Td(stat_name),
-            html.Td(f"{values['temperatura']:.2f}"),
-            html.Td(f"{values['umidade']:.2f}"),
-            html.Td(f"{values['luminosidade']:.2f}")
-        ]) for stat_name, values in stats.items()
-    ])]
-    tabela_stats_children = header + body
+    # 2. Extrai uma única vez os arrays NumPy usados pelos gráficos e pelas estatísticas: os horários,
+    #    a matriz de leituras (linhas x sensores) e a máscara das anomalias. A máscara é calculada
+    #    uma só vez e aplicada aos arrays, e cada subgráfico apenas seleciona sua coluna da matriz.
+    x = df['data_hora'].to_numpy()
+    arr = df[['temperatura', 'umidade', 'luminosidade']].to_numpy(dtype=np.float32) # Já é float32: não gera cópia de conversão.
+    mascara_anomalias = df['anomalia'].to_numpy() == -1
+    x_anomalias = x[mascara_anomalias]
+    # Os cálculos usam `float32`, mas os valores exibidos (gráficos e tabela de anomalias) voltam
+    # para `float64` arredondados a duas casas: do contrário, um 23.45 gravado apareceria como
+    # 23.450000762939453.
+    arr_anomalias = np.round(arr[mascara_anomalias].astype(np.float64), 2)
+
+    # 3. Cria a figura a partir do modelo fixo, preenchendo apenas os dados de cada série. A figura é
+    #    um dicionário simples: o Dash o envia ao navegador sem passar pela validação do Plotly.
+    #    Os arrays NumPy são usados diretamente, sem converter uma Series do Pandas a cada série.
+    # Horários em nanossegundos, usados pelo LTTB apenas quando a janela excede o limite de pontos.
+    reduzir = len(df) > PONTOS_MAXIMOS_GRAFICO
+    x_ns = x.astype('datetime64[ns]').astype(np.int64) if reduzir else None
+    series = []
+    for i in range(len(_SENSORES)):
+        y = arr[:, i]
+        x_serie, y_serie = x, y
+        if reduzir:
+            indices = reduzir_pontos_lttb(x_ns, y, PONTOS_MAXIMOS_GRAFICO)
+            x_serie, y_serie = x[indices], y[indices]
+        # Série com todas as leituras da janela. Ela só cresce no final e perde pontos no início,
+        # o que permite atualizá-la no navegador com `montar_patch_grafico`. `y` vai como lista:
+        # arrays NumPy podem ser serializados em binário (base64), formato que o `Patch` não
+        # consegue estender no navegador.
+        series.append({**_SERIES_GRAFICO[2 * i], 'x': x_serie, 'y': np.round(y_serie.astype(np.float64), 2).tolist()})
+        # Série de anomalias. Ela existe mesmo vazia, para que os índices das séries sejam sempre os mesmos.
+        series.append({**_SERIES_GRAFICO[2 * i + 1], 'x': x_anomalias, 'y': arr_anomalias[:, i]})
+    fig = {'data': series, 'layout': _LAYOUT_GRAFICO}
+
+    # 4. Calcula as estatísticas descritivas com NumPy, direto sobre a matriz (linhas x sensores).
+    #    Cada redução é feita por coluna (`axis=0`) em uma única passada, sem criar Series intermediárias.
+    #    A janela já está em memória (`_BUFFER`), então calcular aqui é mais barato do que pedir ao
+    #    PostgreSQL um agregado (avg, stddev, percentile_cont...) sobre as mesmas linhas: isso
+    #    custaria uma consulta extra, com ordenação das últimas leituras, a cada atualização.
+    #    Agregar a tabela inteira também não compensa: mudaria o significado da tabela (que descreve
+    #    as mesmas leituras exibidas nos gráficos) e ficaria mais lento à medida que o histórico cresce.
+    std = arr.std(axis=0, ddof=1) # `ddof=1`: desvio padrão amostral, igual ao padrão do Pandas.
+    # Matriz (7 estatísticas x 3 sensores), na mesma ordem de `_NOMES_ESTATISTICAS`.
+    arr_stats = np.stack([arr[-1], arr.mean(axis=0), np.median(arr, axis=0), arr.min(axis=0), arr.max(axis=0), std, std * std])
+    # Formata os 21 valores com duas casas decimais em uma única chamada do NumPy.
+    textos_stats = np.char.mod('%.2f', arr_stats).tolist()
+    # Monta a tabela de estatísticas com componentes HTML (o cabeçalho é fixo e já está pronto),
+    # percorrendo as linhas da matriz diretamente, sem consultas por nome de coluna.
+    body = html.Tbody([
+        html.Tr([html.Td(nome)] + [html.Td(texto) for texto in linha])
+        for nome, linha in zip(_NOMES_ESTATISTICAS, textos_stats)
+    ])
+    tabela_stats_children = [_CABECALHO_ESTATISTICAS, body]
 
     # 5. Prepara os dados para a tabela de anomalias.
-    anomalias_data = df_anomalias.to_dict('records') # Converte o DataFrame de anomalias para o formato esperado pela DataTable.
+    #    Seleciona só os campos usados e converte cada coluna em lista de uma vez (operação do Pandas
+    #    por coluna), montando depois os dicionários no formato esperado pela DataTable. Os sensores
+    #    vêm da matriz já arredondada, na mesma ordem de `_CAMPOS_ANOMALIAS`.
+    colunas_anomalias = [df.loc[mascara_anomalias, campo].tolist() for campo in _CAMPOS_ANOMALIAS[:2]]
+    colunas_anomalias += arr_anomalias.T.tolist()
+    anomalias_data = [dict(zip(_CAMPOS_ANOMALIAS, valores)) for valores in zip(*colunas_anomalias)]
 
     # 6. Cria o conteúdo para o card de previsão.
     card_previsao_children = [
@@ -297,12 +757,21 @@ def atualizar_componentes(n):
     ]
 
     # 7. Retorna todos os componentes atualizados para o layout.
-    return fig_temp, fig_umid, fig_lum, tabela_stats_children, anomalias_data, card_previsao_children
+    return fig, tabela_stats_children, anomalias_data, card_previsao_children
 
 # =================================================================================
 # --- EXECUÇÃO DO SERVIDOR ---
 # =================================================================================
 
+# Aquecimento: já na inicialização carrega a janela de leituras, treina o modelo de anomalias
+# (o que também conclui as importações internas do scikit-learn) e monta os componentes.
+# Assim o primeiro acesso ao dashboard é tão rápido quanto os seguintes. Uma falha aqui não
+# impede o servidor de subir: o cache continua vazio e a primeira atualização tenta de novo.
+try:
+    atualizar_cache()
+except Exception as error:
+    print(f"🔥 Erro ao preparar os componentes do dashboard: {error}")
+
 # Este bloco só é executado quando o script é rodado diretamente.
 if __name__ == '__main__':
     # `app.run(debug=True)` inicia um servidor web local para hospedar o dashboard.
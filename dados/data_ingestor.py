@@ -13,8 +13,12 @@
 @details
 Este script atua como uma ponte (bridge) entre um broker MQTT e um banco de dados.
 Ele se conecta a um broker, se inscreve em um tópico específico para receber dados de
-sensores em formato JSON e, para cada mensagem recebida, ele a processa e insere
-as informações em uma tabela no PostgreSQL.
+sensores em formato JSON e grava as leituras em uma tabela no PostgreSQL.
+
+O trabalho é dividido em duas threads ligadas por uma fila (`queue.Queue`): a thread de
+rede do Paho-MQTT apenas enfileira as mensagens recebidas, e uma thread escritora as
+decodifica e grava no banco em lotes (um único INSERT e um único commit por lote).
+Assim, a espera pelo banco de dados não atrasa o recebimento de novas mensagens.
 
 A arquitetura é baseada em eventos (event-driven), utilizando os callbacks da biblioteca
 Paho-MQTT para reagir a conexões e novas mensagens de forma assíncrona. O script é
@@ -27,9 +31,18 @@ print("▶️ Iniciando o script de ingestão de dados (versão JSON)...")
 # --- MÓDULOS IMPORTADOS ---
 import paho.mqtt.client as mqtt  # Biblioteca para comunicação com o broker MQTT.
 import psycopg2                  # Driver para conexão com o banco de dados PostgreSQL.
+import threading                 # Thread escritora, que grava no banco em paralelo à rede MQTT.
+import queue                     # Fila segura entre threads que liga o MQTT à thread escritora.
 import json                      # Módulo para manipular dados no formato JSON (parse de strings).
-import os                        # Módulo de sistema operacional (não utilizado neste script, pode ser removido).
-import time                      # Módulo de tempo (não utilizado neste script, pode ser removido).
+try:
+    # `orjson` (opcional) é um parser JSON compilado, bem mais rápido que o `json` padrão, e
+    # lê os bytes do payload diretamente, sem criar uma string intermediária.
+    from orjson import loads as carregar_json
+except ImportError:
+    # Sem o `orjson`, usa o módulo padrão, que também aceita bytes (UTF-8).
+    carregar_json = json.loads
+import time                      # Módulo de tempo (horário de chegada das mensagens e espera do laço principal).
+from datetime import datetime, timezone # Converte o horário de chegada de cada mensagem para gravá-lo no banco.
 
 # --- SEÇÃO DE CONFIGURAÇÃO ---
 # Centralizar as configurações aqui facilita a manutenção e a adaptação do script
@@ -42,6 +55,11 @@ MQTT_PORT = 4004               # Porta de comunicação do broker MQTT.
 # Isso significa que o script receberá mensagens de tópicos como "Sensores/dados/json",
 # "Dispositivo2/dados/json", etc. Torna o script flexível para múltiplos dispositivos.
 MQTT_TOPIC = "+/dados/json"
+# Exibe no console cada mensagem recebida, cada lote gravado e cada payload descartado por não
+# parecer JSON (erros e descartes de leituras válidas são sempre exibidos).
+# Útil para depuração, mas formatar e imprimir uma linha por mensagem custa mais que o
+# próprio processamento dela; por isso fica desligado por padrão.
+EXIBIR_MENSAGENS = False
 
 # Configurações do Banco de Dados PostgreSQL
 DB_HOST = "localhost"   # Endereço do servidor do banco de dados (neste caso, na mesma máquina).
@@ -50,68 +68,307 @@ DB_NAME = "dados_sensores" # Nome do banco de dados a ser utilizado.
 DB_USER = "postgres"    # Nome de usuário para acessar o banco de dados.
 DB_PASS = "adminpostgres" # Senha para o usuário do banco de dados.
 
+# Configurações de reconexão e tempos limite
+# Se o banco estiver fora do ar (ex: sendo reiniciado), a conexão é tentada novamente com
+# esperas que dobram a cada falha: 0,1 s, 0,2 s, 0,4 s, 0,8 s... até `ESPERA_MAXIMA_CONEXAO`.
+TENTATIVAS_CONEXAO = 10          # Tentativas de conexão antes de desistir.
+ESPERA_INICIAL_CONEXAO = 0.1     # Espera (em segundos) após a primeira falha.
+ESPERA_MAXIMA_CONEXAO = 5.0      # Espera máxima (em segundos) entre duas tentativas.
+# Limites aplicados na sessão do banco, para que um banco travado não prenda a thread escritora.
+TEMPO_LIMITE_COMANDO = "2s"      # `statement_timeout`: duração máxima de cada comando.
+TEMPO_LIMITE_TRANSACAO_OCIOSA = "5s" # `idle_in_transaction_session_timeout`: transação aberta sem atividade.
+
+# Configurações da inserção em lote
+# Cada INSERT com commit individual custa uma ida e volta na rede e uma escrita em disco
+# (fsync do WAL) por leitura. Agrupar as leituras dilui esse custo por todo o lote.
+TAMANHO_MAXIMO_LOTE = 500   # Máximo de leituras gravadas por lote.
+TAMANHO_MAXIMO_FILA = 10000 # Mensagens aguardando gravação; acima disso, novas mensagens são descartadas.
+MAX_TENTATIVAS = 3          # Tentativas de gravar um lote antes de descartá-lo.
+TEMPO_LIMITE_ENCERRAMENTO = 10.0 # Espera máxima (em segundos) pela thread escritora ao encerrar o script.
+# Com `False`, o commit retorna sem esperar a escrita do WAL em disco (`synchronous_commit = off`).
+# Os dados continuam consistentes, mas uma queda do servidor do banco pode perder as leituras
+# confirmadas nos últimos instantes (por padrão, até ~0,6 s), o que é aceitável para telemetria.
+COMMIT_SINCRONO = False
+
 # --- FIM DA CONFIGURAÇÃO ---
 
 
-def conectar_banco():
+def abrir_conexao():
     """
     Tenta estabelecer uma conexão com o banco de dados PostgreSQL.
 
     Utiliza as credenciais e endereços definidos na seção de configuração.
-    A função inclui tratamento de erro para falhas de conexão.
+    A função inclui tratamento de erro para falhas de conexão: tenta novamente até
+    `TENTATIVAS_CONEXAO` vezes, com espera exponencial entre as tentativas.
 
-    @return: Retorna um objeto de conexão (`psycopg2.connection`) em caso de sucesso,
-             ou `None` se a conexão falhar.
+    @return: Retorna um objeto de conexão (`psycopg2.connection`) ainda não configurado
+             (veja `configurar_sessao`), ou `None` se todas as tentativas falharem.
+    """
+    for tentativa in range(1, TENTATIVAS_CONEXAO + 1):
+        try:
+            # Tenta conectar usando os parâmetros globais.
+            conn = psycopg2.connect(
+                host=DB_HOST,
+                port=DB_PORT,
+                dbname=DB_NAME,
+                user=DB_USER,
+                password=DB_PASS
+            )
+            break
+        except psycopg2.OperationalError as e:
+            # Captura erros comuns de conexão (ex: host não encontrado, porta errada, autenticação).
+            print(f"❌ Erro ao conectar ao banco de dados (tentativa {tentativa}/{TENTATIVAS_CONEXAO}): {e}")
+            if tentativa == TENTATIVAS_CONEXAO:
+                return None
+            espera = min(ESPERA_MAXIMA_CONEXAO, ESPERA_INICIAL_CONEXAO * 2 ** (tentativa - 1))
+            print(f"⏳ Nova tentativa em {espera:.1f} s...")
+            time.sleep(espera)
+
+    print("✅ Conectado ao banco de dados PostgreSQL com sucesso!")
+    return conn
+
+
+def configurar_sessao(conn):
+    """
+    Deixa uma conexão recém-aberta pronta para gravar: obtém a trava de instância
+    (`obter_trava_de_instancia`) e prepara a sessão (`preparar_sessao`).
+
+    @param conn: O objeto de conexão recém-aberto com o banco de dados.
+    @return: `"pronta"` se a conexão pode ser usada, `"trava_ocupada"` se outra instância
+             do script já está gravando neste banco, ou `"erro"` se o banco falhar durante
+             a configuração. Nos dois últimos casos a conexão é fechada.
     """
     try:
-        # Tenta conectar usando os parâmetros globais.
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASS
-        )
-        print("✅ Conectado ao banco de dados PostgreSQL com sucesso!")
-        return conn
-    except psycopg2.OperationalError as e:
-        # Captura erros comuns de conexão (ex: host não encontrado, porta errada, autenticação).
-        print(f"❌ Erro ao conectar ao banco de dados: {e}")
+        if not obter_trava_de_instancia(conn):
+            conn.close()
+            return "trava_ocupada"
+        preparar_sessao(conn)
+        return "pronta"
+    except psycopg2.Error as e:
+        print(f"❌ Erro ao preparar a sessão do banco de dados: {e}")
+        conn.close()
+        return "erro"
+
+
+def conectar_banco():
+    """
+    Abre e configura a conexão usada na inicialização do script.
+
+    Também garante que apenas uma instância do script grave no banco: se outra cópia já
+    estiver rodando (inscrita no mesmo tópico), cada mensagem seria inserida duas vezes.
+
+    @return: Retorna um objeto de conexão (`psycopg2.connection`) em caso de sucesso,
+             ou `None` se a conexão falhar ou se outra instância já estiver em execução.
+    """
+    conn = abrir_conexao()
+    if conn is None:
         return None
+    estado = configurar_sessao(conn)
+    if estado == "trava_ocupada":
+        print("❌ Outra instância do script de ingestão já está gravando neste banco. Encerrando.")
+    return conn if estado == "pronta" else None
+
 
+def obter_trava_de_instancia(conn):
+    """
+    Tenta obter a trava (advisory lock) do PostgreSQL que identifica o script de ingestão.
+
+    A trava pertence à sessão: fica com esta conexão até ela ser fechada (inclusive se o
+    processo terminar de forma inesperada), quando o PostgreSQL a libera automaticamente.
+
+    @param conn: O objeto de conexão recém-aberto com o banco de dados.
+    @return: `True` se a trava foi obtida, `False` se outra conexão já a possui.
+    """
+    with conn.cursor() as cursor:
+        # `pg_try_advisory_lock` não espera: retorna `false` na hora se a trava estiver ocupada.
+        cursor.execute("SELECT pg_try_advisory_lock(hashtext('data_ingestor'));")
+        obtida = cursor.fetchone()[0]
+    # Encerra a transação aberta pela consulta; a trava de sessão continua valendo.
+    conn.commit()
+    return obtida
+
+
+def preparar_sessao(conn):
+    """
+    Configura a sessão da conexão e cria o comando preparado usado para gravar os lotes.
+
+    Se `COMMIT_SINCRONO` for `False`, desativa o `synchronous_commit` apenas nesta sessão,
+    eliminando a espera pela escrita do WAL em disco a cada commit. Também define os tempos
+    limite `TEMPO_LIMITE_COMANDO` e `TEMPO_LIMITE_TRANSACAO_OCIOSA`: um comando que passe
+    desse tempo falha (e o lote é tentado novamente) em vez de bloquear a gravação.
+
+    O PostgreSQL analisa e planeja o INSERT uma única vez; cada lote depois só executa
+    `EXECUTE inserir_leituras (...)`. O comando recebe quatro arrays (um por coluna) e os
+    transforma em linhas com `unnest`, de modo que o lote inteiro é um único EXECUTE,
+    com texto SQL curto, independentemente da quantidade de leituras.
 
-def inserir_leitura(conn, temperatura, umidade, luminosidade):
+    O horário de cada leitura (`data_hora`) é enviado explicitamente: o valor padrão da
+    coluna (`CURRENT_TIMESTAMP`) é o início da transação, e daria o mesmo horário a todas
+    as leituras de um lote. O array é `timestamptz[]` para que o PostgreSQL converta o
+    horário (em UTC) para o fuso da sessão, exatamente como faria com `CURRENT_TIMESTAMP`.
+
+    @param conn: O objeto de conexão recém-aberto com o banco de dados.
     """
-    Insere uma nova linha com as leituras dos sensores na tabela do banco de dados.
+    with conn.cursor() as cursor:
+        if not COMMIT_SINCRONO:
+            cursor.execute("SET synchronous_commit = off;")
+        cursor.execute("SET statement_timeout = %s;", (TEMPO_LIMITE_COMANDO,))
+        cursor.execute("SET idle_in_transaction_session_timeout = %s;", (TEMPO_LIMITE_TRANSACAO_OCIOSA,))
+        cursor.execute(
+            """PREPARE inserir_leituras (float8[], float8[], float8[], timestamptz[]) AS
+               INSERT INTO leituras_sensores (temperatura, umidade, luminosidade, data_hora)
+               SELECT * FROM unnest($1, $2, $3, $4);"""
+        )
+    # Encerra a transação aberta implicitamente pelo psycopg2. O comando preparado e a
+    # configuração continuam valendo enquanto a conexão estiver aberta.
+    conn.commit()
+
+
+# --- Gravação em Lote (Thread Escritora) ---
+
+def inserir_lote(conn, cursor, linhas):
+    """
+    Insere várias leituras de uma só vez na tabela do banco de dados.
+
+    Executa o comando preparado em `preparar_sessao` uma única vez para todo o lote,
+    passando as colunas como arrays, e faz um único `commit()`. Em caso de erro, a
+    transação é desfeita e a gravação é tentada novamente até `MAX_TENTATIVAS` vezes.
 
     @param conn: O objeto de conexão ativo com o banco de dados.
-    @param temperatura: O valor da temperatura (float).
-    @param umidade: O valor da umidade (float).
-    @param luminosidade: O valor da luminosidade (float).
+    @param cursor: Um cursor da conexão, reutilizado entre os lotes (veja `escritor_banco`).
+    @param linhas: Lista de tuplas `(temperatura, umidade, luminosidade, data_hora)`.
+    @return: `True` se o lote foi gravado, `False` se foi descartado após as tentativas
+             ou se a conexão foi perdida (nesse caso, `conn.closed` fica diferente de zero).
+    """
+    # Usar '%s' como placeholder é a forma recomendada pelo psycopg2 para evitar ataques de
+    # injeção de SQL. Cada lista Python é enviada como um array do PostgreSQL.
+    sql = """EXECUTE inserir_leituras (%s, %s, %s, %s);"""
+    # Transpõe as tuplas (temperatura, umidade, luminosidade, data_hora) em quatro listas, uma por coluna.
+    colunas = [list(coluna) for coluna in zip(*linhas)]
+
+    for tentativa in range(1, MAX_TENTATIVAS + 1):
+        try:
+            # O lote inteiro é gravado em uma única transação: o `with conn` faz o `commit()` ao
+            # final do bloco ou, em caso de erro, o `rollback()`, garantindo a integridade dos dados.
+            with conn:
+                cursor.execute(sql, colunas)
+            if EXIBIR_MENSAGENS:
+                # Com pouco tráfego, cada lote tem uma única leitura: esta linha seria impressa a cada mensagem.
+                print(f"✔️ Lote de {len(linhas)} leitura(s) inserido com sucesso.")
+            return True
+        except (Exception, psycopg2.Error) as error:
+            print(f"🔥 Erro ao inserir lote no banco de dados (tentativa {tentativa}/{MAX_TENTATIVAS}): {error}")
+            if conn.closed:
+                # Sem conexão, novas tentativas falhariam igualmente; quem chamou decide se reconecta.
+                return False
+    print(f"⚠️ Descartando lote de {len(linhas)} leitura(s) após {MAX_TENTATIVAS} tentativas.")
+    return False
+
+
+def processar_mensagem(topico, payload, recebida_em):
+    """
+    Converte o payload JSON de uma mensagem MQTT em uma tupla de leituras.
+
+    @param topico: O tópico em que a mensagem foi recebida.
+    @param payload: O conteúdo da mensagem, em bytes.
+    @param recebida_em: O horário de chegada da mensagem (`time.time()`, registrado em `on_message`).
+    @return: Uma tupla `(temperatura, umidade, luminosidade, data_hora)`, ou `None` se a
+             mensagem for inválida (o motivo é exibido no console).
+    """
+    if EXIBIR_MENSAGENS:
+        # O payload da mensagem chega como uma sequência de bytes. Para exibi-lo no console
+        # é preciso decodificá-lo para uma string (usando o padrão UTF-8).
+        print(f"📨 Mensagem recebida no tópico '{topico}': {payload.decode('utf-8', errors='replace')}")
+
+    try:
+        # 1. Converte os bytes do payload (que devem ser um JSON) para um dicionário Python.
+        #    O erro de JSON inválido do `orjson` é uma subclasse de `json.JSONDecodeError`.
+        dados_sensores = carregar_json(payload)
+
+        # 2. Extrai cada valor do dicionário usando sua chave correspondente, montando a tupla
+        #    diretamente. A conversão para `float` garante que os dados sejam numéricos.
+        #    O horário de chegada vira um `datetime` com fuso (UTC), gravado em `data_hora`.
+        return (float(dados_sensores['temperatura']),
+                float(dados_sensores['umidade']),
+                float(dados_sensores['luminosidade']),
+                datetime.fromtimestamp(recebida_em, timezone.utc))
+
+    # Tratamento de erros para tornar o script robusto contra mensagens malformadas.
+    except json.JSONDecodeError:
+        print(f"⚠️ Ignorando mensagem. Payload não é um JSON válido: '{payload.decode('utf-8', errors='replace')}'")
+    except KeyError as e:
+        print(f"⚠️ Ignorando mensagem. Chave JSON esperada não encontrada: {e}")
+    except ValueError:
+        print(f"⚠️ Ignorando mensagem. Um dos valores no JSON não é um número válido.")
+    except Exception as e:
+        print(f"🔥 Ocorreu um erro inesperado ao processar a mensagem: {e}")
+    return None
+
+
+def escritor_banco(conn, fila):
     """
-    # A query SQL para inserir os dados. Usar '%s' como placeholder é a forma
-    # recomendada pelo psycopg2 para evitar ataques de injeção de SQL.
-    sql = """INSERT INTO leituras_sensores (temperatura, umidade, luminosidade) VALUES (%s, %s, %s);"""
+    Laço da thread escritora: retira mensagens da fila e as grava no banco em lotes.
+
+    A thread fica bloqueada até chegar uma mensagem e então retira, sem esperar, todas as
+    outras que já estiverem na fila (até `TAMANHO_MAXIMO_LOTE`). Assim, com pouco tráfego
+    cada leitura é gravada assim que chega; com muito tráfego, as mensagens que chegam
+    enquanto um lote está sendo gravado formam naturalmente o lote seguinte.
 
-    cursor = None
+    A thread é a dona da conexão com o banco: se ela cair (ex: banco reiniciado), abre uma
+    nova com `abrir_conexao` e tenta gravar o lote outra vez. Se, nesse meio-tempo, outra
+    instância do script tiver assumido a trava de instância, esta thread encerra (e, com
+    ela, o script; veja o bloco principal) para não duplicar as leituras. Também termina ao
+    receber `None` na fila, depois de gravar tudo o que veio antes dele, e então fecha a conexão.
+
+    @param conn: O objeto de conexão ativo com o banco de dados.
+    @param fila: A `queue.Queue` alimentada pelo callback `on_message`.
+    """
+    # Um único cursor, criado uma vez e reutilizado em todos os lotes, em vez de abrir e
+    # fechar um cursor a cada gravação (um novo só é criado se a conexão for refeita).
+    cursor = conn.cursor()
     try:
-        # Um cursor é um objeto que permite executar comandos no banco de dados.
-        cursor = conn.cursor()
-        # Executa a query, passando os valores em uma tupla para preencher os placeholders.
-        cursor.execute(sql, (temperatura, umidade, luminosidade))
-        # `commit()` efetivamente salva as alterações no banco de dados. Sem isso, a transação seria descartada.
-        conn.commit()
-        print(f"✔️ Dados inseridos com sucesso: Temp={temperatura}°C, Umid={umidade}%, Lux={luminosidade}")
-    except (Exception, psycopg2.Error) as error:
-        print(f"🔥 Erro ao inserir dado no banco de dados: {error}")
-        if conn:
-            # `rollback()` desfaz a transação em caso de erro, garantindo a integridade dos dados.
-            conn.rollback()
+        encerrar = False
+        while not encerrar:
+            mensagens = [fila.get()]
+            while len(mensagens) < TAMANHO_MAXIMO_LOTE:
+                try:
+                    mensagens.append(fila.get_nowait())
+                except queue.Empty:
+                    break
+
+            linhas = []
+            for mensagem in mensagens:
+                if mensagem is None:
+                    encerrar = True
+                    continue
+                leitura = processar_mensagem(*mensagem)
+                if leitura is not None:
+                    linhas.append(leitura)
+
+            if linhas and not inserir_lote(conn, cursor, linhas) and conn.closed:
+                # A conexão caiu. Reconecta (com espera exponencial) e tenta o lote mais uma vez;
+                # se não conseguir, a reconexão é tentada de novo no próximo lote.
+                print("🔄 Conexão com o banco de dados perdida. Reconectando...")
+                nova_conexao = abrir_conexao()
+                estado = configurar_sessao(nova_conexao) if nova_conexao else "erro"
+                if estado == "pronta":
+                    # O cursor antigo pertence à conexão perdida; é fechado antes de ser substituído.
+                    cursor.close()
+                    conn, cursor = nova_conexao, nova_conexao.cursor()
+                    inserir_lote(conn, cursor, linhas)
+                elif estado == "trava_ocupada":
+                    print("❌ Outra instância do script de ingestão assumiu a gravação neste banco. "
+                          f"Descartando lote de {len(linhas)} leitura(s) e encerrando.")
+                    encerrar = True
+                else:
+                    print(f"⚠️ Descartando lote de {len(linhas)} leitura(s): não foi possível reconectar ao banco.")
     finally:
-        # O bloco `finally` garante que o cursor seja fechado, liberando recursos,
-        # independentemente de a operação ter tido sucesso ou falha.
-        if cursor:
-            cursor.close()
+        # Executado em qualquer saída da thread, inclusive por erro inesperado: fecha o cursor
+        # e a conexão de forma limpa, liberando os recursos no servidor do banco de dados.
+        cursor.close()
+        if not conn.closed:
+            conn.close()
+        print("✔️ Conexão com o banco de dados fechada.")
 
 
 # --- Funções de Callback do MQTT ---
@@ -142,40 +399,30 @@ def on_message(client, userdata, msg):
     """
     Função de callback chamada toda vez que uma mensagem é recebida em um tópico inscrito.
 
+    Roda na thread de rede do Paho-MQTT, então faz o mínimo possível: apenas coloca a
+    mensagem na fila da thread escritora. A decodificação do JSON e a gravação no banco
+    acontecem em `escritor_banco`, sem atrasar a leitura de novos pacotes da rede.
+
     @param client: A instância do cliente.
-    @param userdata: Dados do usuário. Usamos para acessar a conexão com o banco de dados.
+    @param userdata: Dados do usuário. Usamos para acessar a fila da thread escritora.
     @param msg: A mensagem recebida. Contém `msg.topic` e `msg.payload`.
     """
-    # Recupera a conexão com o banco de dados que foi armazenada no `userdata`.
-    db_connection = userdata['db_conn']
-
-    # O payload da mensagem chega como uma sequência de bytes. É preciso decodificá-lo
-    # para uma string (usando o padrão UTF-8) antes de processá-lo.
-    payload_str = msg.payload.decode('utf-8')
-    print(f"📨 Mensagem recebida no tópico '{msg.topic}': {payload_str}")
-
+    # Verificação barata, direto nos bytes: um objeto JSON começa com '{' e termina com '}'.
+    # Mensagens vazias ou obviamente inválidas (ex: de outro publicador no mesmo tópico) são
+    # descartadas aqui, sem ocupar espaço na fila nem acionar o parser de JSON.
+    payload = msg.payload
+    if not (payload.startswith(b'{') and payload.endswith(b'}')):
+        if EXIBIR_MENSAGENS:
+            print(f"⚠️ Ignorando mensagem do tópico '{msg.topic}'. Payload não é um objeto JSON.")
+        return
     try:
-        # 1. Converte a string do payload (que deve ser um JSON) para um dicionário Python.
-        dados_sensores = json.loads(payload_str)
-
-        # 2. Extrai cada valor do dicionário usando sua chave correspondente.
-        #    A conversão para `float` garante que os dados sejam numéricos.
-        temp = float(dados_sensores['temperatura'])
-        umid = float(dados_sensores['umidade'])
-        lum = float(dados_sensores['luminosidade'])
-
-        # 3. Com os dados extraídos e validados, chama a função para inseri-los no banco.
-        inserir_leitura(db_connection, temp, umid, lum)
-
-    # Tratamento de erros para tornar o script robusto contra mensagens malformadas.
-    except json.JSONDecodeError:
-        print(f"⚠️ Ignorando mensagem. Payload não é um JSON válido: '{payload_str}'")
-    except KeyError as e:
-        print(f"⚠️ Ignorando mensagem. Chave JSON esperada não encontrada: {e}")
-    except ValueError:
-        print(f"⚠️ Ignorando mensagem. Um dos valores no JSON não é um número válido.")
-    except Exception as e:
-        print(f"🔥 Ocorreu um erro inesperado ao processar a mensagem: {e}")
+        # O horário de chegada é registrado aqui, e não na gravação: as mensagens de um mesmo
+        # lote precisam manter cada uma o seu horário.
+        userdata['fila'].put_nowait((msg.topic, payload, time.time()))
+    except queue.Full:
+        # Se o banco não acompanhar o ritmo das mensagens, a fila enche. Descartar a mensagem
+        # (em vez de bloquear) mantém o cliente MQTT respondendo ao broker.
+        print(f"⚠️ Fila de gravação cheia ({TAMANHO_MAXIMO_FILA} mensagens). Descartando mensagem do tópico '{msg.topic}'.")
 
 
 # --- Bloco Principal de Execução ---
@@ -187,11 +434,17 @@ if __name__ == "__main__":
 
     # 2. Prossiga apenas se a conexão com o banco for bem-sucedida.
     if db_conn:
+        # Fila entre a thread de rede do MQTT (produtora) e a thread escritora (consumidora).
+        fila_mensagens = queue.Queue(maxsize=TAMANHO_MAXIMO_FILA)
+        # A thread escritora é a dona da conexão com o banco de dados.
+        escritor = threading.Thread(target=escritor_banco, args=(db_conn, fila_mensagens), daemon=True)
+        escritor.start()
+
         # Cria uma instância do cliente MQTT.
         client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
-        # Armazena a conexão do banco de dados no "userdata" do cliente.
-        # Isso torna o objeto `db_conn` acessível dentro dos callbacks (como on_message).
-        client.user_data_set({'db_conn': db_conn})
+        # Armazena a fila no "userdata" do cliente.
+        # Isso torna a fila acessível dentro dos callbacks (como on_message).
+        client.user_data_set({'fila': fila_mensagens})
 
         # Associa nossas funções de callback aos eventos correspondentes do cliente.
         client.on_connect = on_connect
@@ -200,10 +453,14 @@ if __name__ == "__main__":
         try:
             # 3. Tenta conectar ao broker MQTT.
             client.connect(MQTT_BROKER, MQTT_PORT, 60)
-            # 4. Inicia o loop de rede. `loop_forever()` é uma função bloqueante que
-            #    mantém o script rodando, ouvindo por mensagens, e tratando
-            #    reconexões automaticamente, até que o script seja interrompido.
-            client.loop_forever()
+            # 4. Inicia o loop de rede em uma thread própria. `loop_start()` retorna
+            #    imediatamente; a thread ouve por mensagens e trata reconexões
+            #    automaticamente, enquanto a thread escritora grava no banco em paralelo.
+            client.loop_start()
+            # Mantém o script rodando até que seja interrompido ou até a thread escritora
+            # encerrar sozinha (ex: outra instância assumiu a gravação no banco).
+            while escritor.is_alive():
+                time.sleep(1)
 
         # Tratamento de erros que podem ocorrer ao iniciar o loop.
         except ConnectionRefusedError:
@@ -214,8 +471,27 @@ if __name__ == "__main__":
             # Captura o sinal de interrupção do teclado (Ctrl+C) para um desligamento limpo.
             print("\n🔌 Desconectando e finalizando o script...")
         finally:
-            # Este bloco é executado sempre ao final, garantindo que a conexão com o banco
-            # seja fechada de forma limpa, liberando os recursos no servidor do banco de dados.
-            if db_conn:
-                db_conn.close()
-                print("✔️ Conexão com o banco de dados fechada.")
\ No newline at end of file
+            # Este bloco é executado sempre ao final. Para o loop de rede e sinaliza o fim à
+            # thread escritora, que grava as mensagens ainda na fila e fecha a conexão com o banco.
+            # Todas as esperas têm tempo limite: se a escritora estiver parada (ex: tentando
+            # reconectar ao banco) com a fila cheia, o script encerra mesmo assim.
+            client.loop_stop()
+            if escritor.is_alive():
+                try:
+                    fila_mensagens.put(None, timeout=TEMPO_LIMITE_ENCERRAMENTO)
+                except queue.Full:
+                    # A fila não esvaziou a tempo: descarta as mensagens pendentes para abrir
+                    # espaço para o sinal de fim.
+                    descartadas = 0
+                    while True:
+                        try:
+                            fila_mensagens.get_nowait()
+                            descartadas += 1
+                        except queue.Empty:
+                            break
+                    print(f"⚠️ Banco de dados sem resposta. Descartando {descartadas} mensagem(ns) não gravada(s).")
+                    fila_mensagens.put_nowait(None)
+                escritor.join(timeout=TEMPO_LIMITE_ENCERRAMENTO)
+                if escritor.is_alive():
+                    # A thread é `daemon`: não impede o fim do processo.
+                    print("⚠️ A thread de gravação não terminou a tempo. Encerrando sem esperá-la.")
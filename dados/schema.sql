@@ -0,0 +1,33 @@
+-- =================================================================================
+-- @file schema.sql
+-- @author Manoel Felipe Costa Furtado
+-- @copyright 2025 Manoel Furtado (MIT License) (veja LICENSE.md)
+--
+-- @brief Estrutura do banco de dados usada por `data_ingestor.py` e `dashboard.py`.
+--
+-- @details
+-- Pode ser executado mais de uma vez sem erro (todos os comandos usam IF NOT EXISTS):
+--     psql -U postgres -d dados_sensores -f schema.sql
+-- Os índices são criados com CONCURRENTLY para não bloquear as inserções do
+-- `data_ingestor.py` caso a tabela já exista e esteja recebendo dados.
+-- =================================================================================
+
+-- Tabela com uma linha por mensagem recebida do Pico W.
+-- `id` é a chave primária (e, portanto, já possui índice B-tree próprio). O dashboard usa
+-- esse índice na consulta incremental `WHERE id > $1 ORDER BY id`.
+CREATE TABLE IF NOT EXISTS leituras_sensores (
+    id           SERIAL PRIMARY KEY,
+    data_hora    TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    temperatura  REAL,
+    umidade      REAL,
+    luminosidade REAL
+);
+
+-- Índice de cobertura para a carga inicial do dashboard:
+--     SELECT ... ORDER BY data_hora DESC, id DESC LIMIT 200
+-- A ordem do índice é a mesma da consulta e o INCLUDE traz as demais colunas. Assim o
+-- PostgreSQL lê apenas as primeiras 200 entradas do índice (index-only scan), sem
+-- percorrer nem ordenar a tabela inteira, independentemente de quantas linhas ela tenha.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS leituras_dh_desc
+    ON leituras_sensores (data_hora DESC, id DESC)
+    INCLUDE (temperatura, umidade, luminosidade);